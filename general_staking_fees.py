@@ -3,10 +3,14 @@ import csv
 import time
 import json
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
 from datetime import datetime, timedelta
 from web3 import Web3
 from web3._utils.events import get_event_data
 from eth_abi import decode_single
+from helper import price_lookup_arrays, find_closest_price
 
 ###############################################################################
 # STUBS OR IMPORTS FOR HELPER FUNCTIONS / ABIs
@@ -39,30 +43,31 @@ ERC20_ABI = [
 
 
 def stitch_files():
+    """
+    Appends the telosV2 staking fees after the telos ones, shifting V2's cumulative
+    USD by the last telos value. Runs on Arrow tables end to end, no DataFrames.
+    """
+    t1 = pacsv.read_csv("csv/staking_fees/telos_staking_fees_with_usd.csv")
+    t2 = pacsv.read_csv("csv/staking_fees/telosV2_staking_fees_with_usd.csv")
 
-    df1 = pd.read_csv("csv/staking_fees/telos_staking_fees_with_usd.csv")
-    df2 = pd.read_csv("csv/staking_fees/telosV2_staking_fees_with_usd.csv")
-
-    # 1) Sort each by date_time
-    df1["date_time"] = pd.to_datetime(df1["date_time"])
-    df2["date_time"] = pd.to_datetime(df2["date_time"])
-    df1.sort_values("date_time", inplace=True)
-    df2.sort_values("date_time", inplace=True)
+    # 1) Sort each by date_time (parsed as timestamps by the reader)
+    t1 = t1.sort_by("date_time")
+    t2 = t2.sort_by("date_time")
 
     # (Optional) remove overlap:
-    last_date_df1 = df1["date_time"].max()
-    df2 = df2[df2["date_time"] > last_date_df1]
+    last_date_t1 = pc.max(t1["date_time"])
+    t2 = t2.filter(pc.greater(t2["date_time"], last_date_t1))
 
     # 2) Shift second file’s cumulative column
-    last_cumulative = df1["usd_rewards"].iloc[-1]
-    df2["usd_rewards"] = df2["usd_rewards"] + last_cumulative
+    last_cumulative = t1["usd_rewards"][-1]
+    usd_idx = t2.column_names.index("usd_rewards")
+    t2 = t2.set_column(usd_idx, "usd_rewards", pc.add(t2["usd_rewards"], last_cumulative))
 
     # 3) Merge & re‐sort
-    combined = pd.concat([df1, df2], ignore_index=True)
-    combined.sort_values("date_time", inplace=True)
+    combined = pa.concat_tables([t1, t2]).sort_by("date_time")
 
     # 4) Save
-    combined.to_csv("stitched_file.csv", index=False)
+    pacsv.write_csv(combined.combine_chunks(), "stitched_file.csv")
 
 
 # In a real setup, these come from helper.py or a separate file
@@ -88,16 +93,6 @@ def load_historical_prices(csv_path):
     df["date"] = pd.to_datetime(df["date"])
     return df
 
-def find_closest_price(block_date, historical_prices_df):
-    """
-    Finds the closest date in `historical_prices_df` to `block_date`,
-    and returns the corresponding price.
-    """
-    historical_prices_df["time_diff"] = abs(historical_prices_df["date"] - block_date)
-    idx = historical_prices_df["time_diff"].idxmin()
-    return float(historical_prices_df.loc[idx, "price"])
-
-
 def update_staking_fees_data(network, staking_fees, amount_usd, fee_type):
     """
     In-memory aggregator for staking fees (USD).
@@ -398,14 +393,15 @@ def calculate_new_usd_rows(new_df, historical_prices_df, starting_token, startin
     cumulative_usd = starting_usd
     prev_token_amount = starting_token
     usd_list = []
+    date_ns, prices = price_lookup_arrays(historical_prices_df)
 
-    for _, row in new_df.iterrows():
-        dt = row["date_time"]
+    for row in new_df.itertuples(index=False):
+        dt = row.date_time
         # Convert to daily date if you want daily resolution
         # or just use dt.date() if you store daily prices only
-        price = find_closest_price(dt, historical_prices_df)
+        price = find_closest_price(dt, date_ns, prices)
 
-        current_token_amount = row["token_amount"]
+        current_token_amount = row.token_amount
         increment = current_token_amount - prev_token_amount
         # If your real token is 18 decimals, ensure your raw CSV matched that
         # Right now we assume the raw "token_amount" is already in human units
@@ -1,6 +1,12 @@
 import requests
 import os
+import time
+import asyncio
+import aiohttp
+import threading
+import numpy as np
 import pandas as pd
+from datetime import datetime
 
 def fetch_historical_prices(coin_id, currency, from_date, to_date):
     """
@@ -42,11 +48,281 @@ def load_historical_prices(historical_prices_file):
 
     return df   
     
-def find_closest_price(date, historical_prices_df):
+def price_lookup_arrays(historical_prices_df):
     """
-    Finds the closest date in historical_prices_df and returns the 'price'.
+    Returns (date_ns, prices) as NumPy arrays sorted by date, built once per
+    conversion run so each find_closest_price call is a binary search.
     """
-    date = pd.to_datetime(date)
-    diffs = (historical_prices_df["date"] - date).abs()
-    idx = diffs.idxmin()
-    return historical_prices_df.loc[idx, "price"]
\ No newline at end of file
+    df = historical_prices_df.sort_values("date", kind="stable")
+    return df["date"].to_numpy(dtype="datetime64[ns]").view("int64"), df["price"].to_numpy(dtype="float64")
+
+def find_closest_price(date, date_ns, prices, day_level=False):
+    """
+    Finds the closest date in the sorted `date_ns` array (see price_lookup_arrays) and
+    returns its price. With `day_level`, `date` is truncated to its calendar day first.
+    """
+    ts_ns = np.datetime64(date, "D" if day_level else "ns").astype("datetime64[ns]").view("int64")
+    i = int(np.searchsorted(date_ns, ts_ns))
+    # Pick the nearer neighbour; ties go to the earlier date, as idxmin did
+    if i == len(date_ns) or (i > 0 and ts_ns - date_ns[i - 1] <= date_ns[i] - ts_ns):
+        i -= 1
+    return float(prices[i])
+
+def csv_last_block(path):
+    """
+    Block number on the last line of a CSV, read from the file's tail, or None.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - 4096))
+        lines = f.read().splitlines()
+    try:
+        return int(lines[-1].split(b",", 1)[0])
+    except (IndexError, ValueError):
+        return None
+
+def export_usd_csv(path, df, new_rows_df=None):
+    """
+    Writes `df` to the CSV at `path`. When `new_rows_df` is the tail of `df` and only
+    extends it past the CSV's current last block, just those rows are appended.
+    """
+    if new_rows_df is not None and len(new_rows_df) < len(df):
+        previous_last_block = df["block"].iat[len(df) - len(new_rows_df) - 1]
+        if (list(new_rows_df.columns) == list(df.columns)
+                and new_rows_df["block"].is_monotonic_increasing
+                and new_rows_df["block"].iat[0] > previous_last_block
+                and csv_last_block(path) == previous_last_block):
+            new_rows_df.to_csv(path, mode="a", header=False, index=False)
+            return
+    df.to_csv(path, index=False)
+
+
+# Cap on in-flight JSON-RPC requests per endpoint
+RPC_MAX_CONCURRENCY = 64
+# Number of block windows dispatched together before results are written out
+LOG_WINDOW_BATCH = 1024
+# Max eth_getBlockByNumber calls packed into one JSON-RPC batch POST
+BLOCK_BATCH_SIZE = 100
+
+# Memoized block datetimes keyed by (rpc_url, block_number)
+_block_datetimes = {}
+
+# One keep-alive requests.Session per thread (networks sync in parallel threads)
+HTTP_POOL_SIZE = 16
+_sessions = threading.local()
+
+def http_session(pool_size=HTTP_POOL_SIZE):
+    """
+    Returns this thread's shared requests.Session so repeated RPC POSTs reuse connections.
+    `pool_size` caps its connections per host and only applies when the session is created.
+    """
+    session = getattr(_sessions, "session", None)
+    if session is None:
+        session = _sessions.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+    return session
+
+# eth_getLogs errors meaning "range too large / too many results": split the window instead of retrying it.
+# -32005 is "limit exceeded"; other codes (e.g. -32602 invalid params, -32000) only count when the
+# message names a range or result limit, so a malformed filter is not bisected down to single blocks.
+LOG_RANGE_ERROR_CODES = (-32005,)
+LOG_RANGE_ERROR_MESSAGES = (
+    "query returned more than", "query exceeds", "response size exceeded", "too many blocks",
+    "range too large", "range is too large", "exceeds max block range", "block range limit",
+    "result limit", "results limit"
+)
+# Max times one window is halved before giving up (2**12 = 4096 pieces)
+LOG_MAX_SPLIT_DEPTH = 12
+
+class LogRangeTooLargeError(Exception):
+    """Raised when the RPC rejects an eth_getLogs range as too large."""
+
+def is_log_range_error(error):
+    """
+    True if a JSON-RPC error object says the eth_getLogs range or result set is too large.
+    """
+    if not isinstance(error, dict):
+        return False
+    message = str(error.get("message", "")).lower()
+    return error.get("code") in LOG_RANGE_ERROR_CODES or any(m in message for m in LOG_RANGE_ERROR_MESSAGES)
+
+async def async_rpc_request(session, semaphore, rpc_url, method, params, retries=5, delay=2):
+    """
+    POSTs a single raw JSON-RPC request and returns its 'result'.
+    Retries with exponential backoff and re-raises the last error after `retries` attempts.
+    Range-too-large eth_getLogs errors raise LogRangeTooLargeError right away, since
+    retrying the same range cannot succeed.
+    """
+    payload = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params}
+    attempt = 0
+    while True:
+        try:
+            async with semaphore:
+                async with session.post(rpc_url, json=payload) as resp:
+                    body = await resp.json(content_type=None)
+            if "error" in body:
+                if is_log_range_error(body["error"]):
+                    raise LogRangeTooLargeError(f"RPC error: {body['error']}")
+                raise Exception(f"RPC error: {body['error']}")
+            return body["result"]
+        except LogRangeTooLargeError:
+            raise
+        except Exception as e:
+            attempt += 1
+            if attempt >= retries:
+                raise
+            print(f"Attempt {attempt} - Error calling {method}: {e}")
+            await asyncio.sleep(delay)
+            delay *= 2
+
+# RPC endpoints that do not support JSON-RPC batches. An endpoint lands here when its error
+# says so, or after BATCH_REJECT_AFTER non-list replies in a row (a one-off 429 does not count)
+_batch_rejected = set()
+_batch_misses = {}
+BATCH_REJECT_AFTER = 5
+
+async def async_rpc_logs_with_block(session, semaphore, rpc_url, log_params, block_num):
+    """
+    POSTs eth_getLogs and eth_getBlockByNumber(block_num) as one JSON-RPC batch, memoizing
+    the block's datetime and returning the logs. Returns None when the batch or its
+    eth_getLogs part failed, so the caller can fall back to a plain request for this window.
+    """
+    batch = [
+        {"jsonrpc": "2.0", "id": 0, "method": "eth_getLogs", "params": log_params},
+        {"jsonrpc": "2.0", "id": 1, "method": "eth_getBlockByNumber", "params": [hex(block_num), False]}
+    ]
+    async with semaphore:
+        async with session.post(rpc_url, json=batch) as resp:
+            body = await resp.json(content_type=None)
+    if not isinstance(body, list):
+        _batch_misses[rpc_url] = _batch_misses.get(rpc_url, 0) + 1
+        error = body.get("error") if isinstance(body, dict) else None
+        if "batch" in str(error).lower() or _batch_misses[rpc_url] >= BATCH_REJECT_AFTER:
+            print(f"Batch requests unsupported by {rpc_url}, using single requests: {body}")
+            _batch_rejected.add(rpc_url)
+        return None
+    _batch_misses[rpc_url] = 0
+
+    by_id = {item.get("id"): item for item in body if isinstance(item, dict)}
+    block = by_id.get(1, {}).get("result")
+    if block:
+        _block_datetimes[(rpc_url, block_num)] = datetime.utcfromtimestamp(int(block["timestamp"], 16))
+
+    logs = by_id.get(0, {})
+    if is_log_range_error(logs.get("error")):
+        raise LogRangeTooLargeError(f"RPC error: {logs['error']}")
+    return logs.get("result")
+
+async def _fetch_logs_in_windows(rpc_url, windows, address, topics, retries, delay, with_timestamps, concurrency):
+    connector = aiohttp.TCPConnector(limit_per_host=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async def fetch_window(from_block, to_block, want_block=with_timestamps, depth=0):
+            params = [{
+                "fromBlock": hex(from_block),
+                "toBlock": hex(to_block),
+                "address": address,
+                "topics": topics
+            }]
+            try:
+                # Piggyback the to_block header on the same POST while the endpoint accepts batches
+                if want_block and rpc_url not in _batch_rejected and (rpc_url, to_block) not in _block_datetimes:
+                    try:
+                        logs = await async_rpc_logs_with_block(session, semaphore, rpc_url, params, to_block)
+                    except LogRangeTooLargeError:
+                        raise
+                    except Exception as e:
+                        print(f"Batched getLogs for blocks {from_block} → {to_block} failed, retrying singly: {e}")
+                        logs = None
+                    if logs is not None:
+                        return logs
+                return await async_rpc_request(session, semaphore, rpc_url, "eth_getLogs", params, retries, delay)
+            except LogRangeTooLargeError as e:
+                # Stop the run rather than record an empty window as a zero-fee gap
+                if from_block >= to_block or depth >= LOG_MAX_SPLIT_DEPTH:
+                    raise LogRangeTooLargeError(
+                        f"Blocks {from_block} → {to_block} still too large after {depth} splits: {e}"
+                    ) from e
+                # Bisect and fetch both halves concurrently; logs stay in block order
+                mid = (from_block + to_block) // 2
+                print(f"Range {from_block} → {to_block} too large, splitting at {mid}")
+                left, right = await asyncio.gather(
+                    fetch_window(from_block, mid, False, depth + 1),
+                    fetch_window(mid + 1, to_block, want_block, depth + 1)
+                )
+                if left is None or right is None:
+                    return None
+                return left + right
+            except Exception as e:
+                # None, not [], so callers can tell a failed window from one without events
+                print(f"Failed to fetch logs for blocks {from_block} → {to_block} after {retries} attempts: {e}")
+                return None
+
+        results = await asyncio.gather(*(fetch_window(f, t) for f, t in windows))
+
+    return {to_block: logs for (_, to_block), logs in zip(windows, results)}
+
+def fetch_logs_in_windows(rpc_url, windows, address, topics, retries=5, delay=2, with_timestamps=False,
+                          concurrency=RPC_MAX_CONCURRENCY):
+    """
+    Fetches eth_getLogs for every (from_block, to_block) window concurrently over raw JSON-RPC,
+    with at most `concurrency` requests in flight.
+    Windows the RPC rejects as too large are bisected until they fit, and the halves' logs merged;
+    a window that still does not fit after LOG_MAX_SPLIT_DEPTH splits raises LogRangeTooLargeError.
+    With `with_timestamps`, each window's to_block header rides in the same JSON-RPC batch and
+    is memoized for fetch_block_timestamps; endpoints that reject batches fall back to plain calls.
+    Returns a dict of raw log dicts keyed by each window's to_block; windows that still failed
+    after `retries` attempts map to None, and callers should stop before the first of them.
+    """
+    return asyncio.run(
+        _fetch_logs_in_windows(rpc_url, windows, address, topics, retries, delay, with_timestamps, concurrency)
+    )
+
+def fetch_block_timestamps(w3, block_nums, retries=5, delay=2):
+    """
+    Fetches the UTC datetimes for many blocks with batched eth_getBlockByNumber calls
+    (one HTTP POST per BLOCK_BATCH_SIZE blocks). Results are memoized per (rpc_url, block).
+    Returns a dict keyed by block number; blocks that could not be fetched are left out.
+    """
+    rpc_url = w3.provider.endpoint_uri
+    missing = [b for b in dict.fromkeys(block_nums) if (rpc_url, b) not in _block_datetimes]
+
+    for i in range(0, len(missing), BLOCK_BATCH_SIZE):
+        chunk = missing[i:i + BLOCK_BATCH_SIZE]
+        batch = [
+            {"jsonrpc": "2.0", "id": n, "method": "eth_getBlockByNumber", "params": [hex(block_num), False]}
+            for n, block_num in enumerate(chunk)
+        ]
+
+        attempt, wait = 0, delay
+        while attempt < retries:
+            try:
+                resp = http_session().post(rpc_url, json=batch)
+                resp.raise_for_status()
+                responses = resp.json()
+                if not isinstance(responses, list):
+                    raise Exception(f"Batch request rejected: {responses}")
+                break
+            except Exception as e:
+                print(f"Attempt {attempt + 1} - Error fetching block timestamps: {e}")
+                time.sleep(wait)
+                attempt += 1
+                wait *= 2
+        else:
+            print(f"Failed to fetch timestamps for blocks {chunk[0]} → {chunk[-1]} after {retries} attempts.")
+            continue
+
+        for item in responses:
+            result = item.get("result")
+            if not result:
+                print(f"Error fetching block {chunk[item['id']]}: {item.get('error')}")
+                continue
+            block_dt = datetime.utcfromtimestamp(int(result["timestamp"], 16))
+            _block_datetimes[(rpc_url, chunk[item["id"]])] = block_dt
+
+    return {b: _block_datetimes[(rpc_url, b)] for b in block_nums if (rpc_url, b) in _block_datetimes}
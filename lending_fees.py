@@ -7,6 +7,7 @@ from datetime import datetime
 from web3 import Web3
 from web3.exceptions import LogTopicError
 from datetime import datetime, timedelta
+from helper import price_lookup_arrays, find_closest_price
 
 ###############################################################################
 # ABIs & EVENT SIGNATURES
@@ -134,16 +135,6 @@ def load_historical_prices(csv_path):
         raise ValueError(f"[ERROR] Invalid date format in {csv_path}")
     return df
 
-def find_closest_price(block_date, historical_prices_df):
-    """
-    Finds the closest date in historical_prices_df to block_date (day-level).
-    Returns the corresponding price (float).
-    """
-    block_date = block_date.replace(hour=0, minute=0, second=0, microsecond=0)
-    diffs = (historical_prices_df["date"] - block_date).abs()
-    idx = diffs.idxmin()
-    return float(historical_prices_df.loc[idx, "price"])
-
 ###############################################################################
 # CONFIG
 ###############################################################################
@@ -360,12 +351,17 @@ def calculate_new_usd_rows(new_df, hist_df, prev_eth, prev_usd):
     usd_list = []
     old_eth = prev_eth
     cur_usd = prev_usd
+    price_by_day = {}  # many rows share a calendar day, so look each day up once
+    date_ns, prices = price_lookup_arrays(hist_df)
 
-    for _, row in new_df.iterrows():
-        dt = row["date_time"]
-        price = find_closest_price(dt, hist_df)
+    for row in new_df.itertuples(index=False):
+        dt = row.date_time
+        day = dt.toordinal()
+        price = price_by_day.get(day)
+        if price is None:
+            price = price_by_day[day] = find_closest_price(dt, date_ns, prices, day_level=True)
 
-        new_eth = row["treasury_cum_eth"]
+        new_eth = row.treasury_cum_eth
         eth_incr = new_eth - old_eth
         eth_incr_usd = eth_incr * price
 
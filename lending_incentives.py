@@ -1,10 +1,14 @@
 import os
 import csv
 import time
-import json
+import queue
+import sqlite3
+import threading
+import orjson
 import requests
 import pandas as pd
 import matplotlib.pyplot as plt
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 from web3 import Web3
 from helper import *
@@ -14,8 +18,8 @@ from helper import *
 ###############################################################################
 
 def load_config(config_file):
-    with open(config_file, "r") as f:
-        return json.load(f)
+    with open(config_file, "rb") as f:
+        return orjson.loads(f.read())
 
 CONFIG = load_config("config.json")
 
@@ -38,6 +42,19 @@ contract_abi = [
         "type": "event"
     }
 ]
+
+# topic0 for RewardsAccrued; constant, so computed once at import
+REWARDS_ACCRUED_SIGNATURE = Web3.keccak(text="RewardsAccrued(address,uint256)").hex()
+
+# Persistent (chain_id, block) -> timestamp cache shared across runs
+TIMESTAMP_CACHE_DB = "timestamp_cache.sqlite"
+
+# Rows appended between writes of a controller's resume-state sidecar
+STATE_SAVE_EVERY = 50
+
+# Set to True to cross-check the manual RewardsAccrued decoding against the ABI decoder
+VERIFY_LOG_DECODING = False
+
 ###############################################################################
 # 1) FETCH OR GENERATE HISTORICAL PRICES INCREMENTALLY
 ###############################################################################
@@ -53,14 +70,8 @@ def generate_fixed_telos_prices(from_date, to_date):
     if isinstance(to_date, datetime):
         to_date = to_date.date()
 
-    day_count = (to_date - from_date).days + 1
-    data = []
-    current_day = from_date
-    for _ in range(day_count):
-        date_str = current_day.strftime('%Y-%m-%d')
-        data.append([date_str, 1.0])  # Price always 1
-        current_day += timedelta(days=1)
-    return data
+    days = pd.date_range(from_date, to_date, freq="D").strftime('%Y-%m-%d')
+    return [[date_str, 1.0] for date_str in days]  # Price always 1
 
 def save_to_csv(filename, data):
     """
@@ -78,7 +89,7 @@ def update_historical_csv(network_name, coin_id, from_date, to_date, csv_path):
     Incrementally updates the historical prices CSV. Steps:
       1) If CSV doesn't exist, create it from scratch (entire range).
       2) If CSV does exist, find the latest date in it and fetch only NEW data.
-      3) Append, deduplicate, and save.
+      3) Deduplicate the new days and append them to the end of the CSV.
     """
     # Helper function to fetch from CoinGecko (like in helper.py)
     def fetch_coingecko_data(coin_id, currency, start_dt, end_dt):
@@ -132,35 +143,48 @@ def update_historical_csv(network_name, coin_id, from_date, to_date, csv_path):
     else:
         new_data = fetch_coingecko_data(coin_id, "usd", new_start_date, to_date)
 
-    # 5) Convert new_data -> DataFrame, merge with existing
+    # 5) Convert new_data -> DataFrame, keeping one price per day strictly after the existing data
     df_new = pd.DataFrame(new_data, columns=["date", "price"])
     df_new["date"] = pd.to_datetime(df_new["date"], format='%Y-%m-%d', errors='coerce')
+    df_new.drop_duplicates(subset=["date"], keep='last', inplace=True)
+    df_new = df_new[df_new["date"].dt.date > existing_latest_date].sort_values('date')
 
-    merged = pd.concat([existing_df, df_new], ignore_index=True)
-    merged.drop_duplicates(subset=["date"], keep='last', inplace=True)
-    merged.sort_values('date', inplace=True)
-
-    # 6) Save final
-    merged_rows = merged[["date", "price"]].values.tolist()
-    out_rows = []
-    for row in merged_rows:
-        dt_str = row[0].strftime('%Y-%m-%d')
-        price = row[1]
-        out_rows.append([dt_str, price])
+    if df_new.empty:
+        print(f"[INFO] No new price rows for {network_name} after {existing_latest_date}.")
+        return
 
-    save_to_csv(csv_path, out_rows)
-    print(f"[INFO] Updated {csv_path} from {new_start_date} to {to_date}.")
+    # 6) Append only the new rows instead of rewriting the whole file, matching its line
+    #    endings (save_to_csv writes CRLF) and finishing an unterminated last line first
+    with open(csv_path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - 4096))
+        tail = f.read()
+    line_end = "\n" if b"\n" in tail and b"\r\n" not in tail else "\r\n"
+
+    df_new["date"] = df_new["date"].dt.strftime('%Y-%m-%d')
+    with open(csv_path, "a", newline="") as f:
+        if tail and not tail.endswith(b"\n"):
+            f.write(line_end)
+        df_new[["date", "price"]].to_csv(f, header=False, index=False, lineterminator=line_end)
+    print(f"[INFO] Appended {len(df_new)} rows to {csv_path} from {new_start_date} to {to_date}.")
 
 ###############################################################################
 # 2) FETCH ON-CHAIN REWARDS (Using Web3, chunked approach)
 ###############################################################################
 
+class OrjsonHTTPProvider(Web3.HTTPProvider):
+    """
+    HTTPProvider that parses JSON-RPC responses (notably large eth_getLogs payloads) with orjson.
+    """
+    def decode_rpc_response(self, raw_response):
+        return orjson.loads(raw_response)
+
 def setup_web3(rpc_urls):
     """
     Sets up a Web3 instance using the first working RPC URL from the list.
     """
     for rpc in rpc_urls:
-        web3 = Web3(Web3.HTTPProvider(rpc))
+        web3 = Web3(OrjsonHTTPProvider(rpc))
         if web3.isConnected():
             return web3
     raise ConnectionError(f"Could not connect to any RPC URL: {rpc_urls}")
@@ -196,6 +220,50 @@ def load_existing_data(csv_file):
 
     return blocks_list, dates_list, rewards_list
 
+def state_file_path(csv_file):
+    """Path of the resume-state sidecar kept next to a rewards CSV."""
+    return f"{csv_file}.state.json"
+
+def csv_fingerprint(csv_file):
+    """(size, mtime_ns) of the CSV, used to tell whether the sidecar still describes it."""
+    st = os.stat(csv_file)
+    return [st.st_size, st.st_mtime_ns]
+
+def save_resume_state(csv_file, last_block, cum_rewards):
+    """
+    Atomically writes {last_block, cum_rewards} to the CSV's sidecar file, together with
+    the CSV's current size and mtime so a CSV changed behind its back is detected.
+    """
+    state_file = state_file_path(csv_file)
+    tmp_file = f"{state_file}.tmp"
+    state = {"last_block": last_block, "cum_rewards": cum_rewards, "csv": csv_fingerprint(csv_file)}
+    with open(tmp_file, "wb") as f:
+        f.write(orjson.dumps(state))
+    os.replace(tmp_file, state_file)
+
+def load_resume_state(csv_file):
+    """
+    Returns (last_block, cum_rewards) to resume from, or None if nothing was processed yet.
+    Reads the small sidecar file when it matches the CSV (e.g. not after a pull, revert, or a
+    crash between the CSV append and the state write) and otherwise scans the CSV.
+    """
+    if not os.path.isfile(csv_file):
+        return None
+
+    try:
+        with open(state_file_path(csv_file), "rb") as f:
+            state = orjson.loads(f.read())
+        if state["csv"] == csv_fingerprint(csv_file):
+            return state["last_block"], state["cum_rewards"]
+        print(f"Resume state for {csv_file} is stale, re-reading the CSV.")
+    except (FileNotFoundError, orjson.JSONDecodeError, KeyError):
+        pass
+
+    blocks_list, dates_list, rewards_list = load_existing_data(csv_file)
+    if len(blocks_list) == 0:
+        return None
+    return blocks_list[-1], rewards_list[-1]
+
 def append_data_to_csv(csv_file, block_num, date_time, cum_rewards):
     """
     Appends a single row [block, date_time, reward] to the CSV.
@@ -205,21 +273,55 @@ def append_data_to_csv(csv_file, block_num, date_time, cum_rewards):
         writer = csv.writer(f)
         writer.writerow([block_num, date_time, cum_rewards])
 
-def fetch_block_date(web3, block_num):
+_timestamp_cache = None
+
+def get_timestamp_cache():
+    """
+    Opens (once) the sqlite block timestamp cache, creating the table if needed.
+    """
+    global _timestamp_cache
+    if _timestamp_cache is None:
+        _timestamp_cache = sqlite3.connect(TIMESTAMP_CACHE_DB, check_same_thread=False)
+        _timestamp_cache.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "chain_id INTEGER, block INTEGER, ts INTEGER, PRIMARY KEY(chain_id, block))"
+        )
+        _timestamp_cache.commit()
+    return _timestamp_cache
+
+def cache_block_timestamps(chain_id, block_timestamps):
+    """
+    Stores an iterable of (block, timestamp) pairs for chain_id in the cache.
+    """
+    cache = get_timestamp_cache()
+    cache.executemany(
+        "INSERT OR IGNORE INTO cache (chain_id, block, ts) VALUES (?, ?, ?)",
+        [(chain_id, block, ts) for block, ts in block_timestamps]
+    )
+    cache.commit()
+
+def fetch_block_date(web3, block_num, chain_id):
     """
     Fetches the timestamp for a given block and converts it to a human-readable date.
+    Timestamps are looked up in the on-disk cache first and only fetched over RPC on a miss.
     """
-    block = web3.eth.getBlock(block_num)
-    timestamp = block.timestamp
-    return datetime.utcfromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+    row = get_timestamp_cache().execute(
+        "SELECT ts FROM cache WHERE chain_id=? AND block=?", (chain_id, block_num)
+    ).fetchone()
+    if row is not None:
+        timestamp = row[0]
+    else:
+        block = web3.eth.getBlock(block_num)
+        timestamp = block.timestamp
+        cache_block_timestamps(chain_id, [(block_num, timestamp)])
+    t = time.gmtime(timestamp)
+    return f"{t.tm_year:04d}-{t.tm_mon:02d}-{t.tm_mday:02d} {t.tm_hour:02d}:{t.tm_min:02d}:{t.tm_sec:02d}"
 
 def fetch_rewards_in_range(web3, contract, event_signature, from_block, to_block):
     """
     Fetches RewardsAccrued events between from_block and to_block.
     Returns total rewards found in that block range.
     """
-    total_rewards = 0
-
     logs = web3.eth.get_logs({
         "fromBlock": from_block,
         "toBlock": to_block,
@@ -227,12 +329,22 @@ def fetch_rewards_in_range(web3, contract, event_signature, from_block, to_block
         "topics": [event_signature]
     })
 
-    event = contract.events.RewardsAccrued()
+    # The event payload is a single uint256, so decode it directly instead of
+    # going through the ABI codec for every log. All logs in a response share
+    # the same data type, so pick the decoder once and sum in sum()'s C loop.
+    if not logs:
+        return 0
+    if isinstance(logs[0]["data"], str):
+        _int = int
+        total_rewards = sum(_int(e["data"], 16) for e in logs)
+    else:
+        _int_from = int.from_bytes
+        total_rewards = sum(_int_from(e["data"], "big") for e in logs)
 
-    for entry in logs:
-        decoded = event.processLog(entry)
-        amount = decoded["args"]["amount"]
-        total_rewards += amount
+    if VERIFY_LOG_DECODING:
+        event = contract.events.RewardsAccrued()
+        expected = sum(event.processLog(entry)["args"]["amount"] for entry in logs)
+        assert total_rewards == expected, f"Manual decode mismatch: {total_rewards} != {expected}"
 
     return total_rewards
 
@@ -255,18 +367,18 @@ def process_controller(network_name, version_label, controller_config, rpc_urls)
     # Setup Web3
     web3 = setup_web3(rpc_urls)
     contract = web3.eth.contract(address=contract_address, abi=contract_abi)
-    event_signature = web3.keccak(text="RewardsAccrued(address,uint256)").hex()
+    chain_id = web3.eth.chain_id
 
-    # Load existing data (if any)
-    blocks_list, dates_list, rewards_list = load_existing_data(csv_file)
+    # Load the resume point (if any)
+    resume_state = load_resume_state(csv_file)
 
     # Determine the starting point
-    if len(blocks_list) == 0:
+    if resume_state is None:
         current_block = default_start_block
         cumulative_rewards = 0.0
     else:
-        current_block = blocks_list[-1] + 1
-        cumulative_rewards = rewards_list[-1]
+        last_block, cumulative_rewards = resume_state
+        current_block = last_block + 1
 
     latest_block = web3.eth.blockNumber
     if current_block > latest_block:
@@ -275,24 +387,67 @@ def process_controller(network_name, version_label, controller_config, rpc_urls)
 
     print(f"Fetching data from block {current_block} to {latest_block}...")
 
-    while current_block <= latest_block:
-        end_block = min(current_block + chunk_size - 1, latest_block)
-        print(f"  Processing blocks [{current_block} -> {end_block}]...")
+    # A producer thread fetches chunks over RPC while this thread writes the CSV,
+    # so file I/O overlaps with the next round-trip. The bounded queue provides
+    # backpressure, and a single producer keeps the chunks in block order.
+    results = queue.Queue(maxsize=4)
 
-        # Fetch rewards in this block range
-        chunk_rewards = fetch_rewards_in_range(web3, contract, event_signature, current_block, end_block)
+    def produce(start_block):
+        try:
+            while start_block <= latest_block:
+                end_block = min(start_block + chunk_size - 1, latest_block)
+                print(f"  Processing blocks [{start_block} -> {end_block}]...")
+
+                # Fetch rewards in this block range
+                chunk_rewards = fetch_rewards_in_range(web3, contract, REWARDS_ACCRUED_SIGNATURE, start_block, end_block)
+
+                # Empty chunks leave the cumulative total unchanged, so skip both the
+                # getBlock call and the CSV row. The final chunk is always written so
+                # the next run resumes from the chain tip.
+                if chunk_rewards == 0 and end_block < latest_block:
+                    start_block = end_block + 1
+                    time.sleep(0.2)
+                    continue
 
-        # Update cumulative
-        cumulative_rewards += chunk_rewards / 10**18  # Assuming rewards have 18 decimals
+                # Fetch block date (we'll label it by the end_block's timestamp)
+                date_time_str = fetch_block_date(web3, end_block, chain_id)
 
-        # Fetch block date (we'll label it by the end_block's timestamp)
-        date_time_str = fetch_block_date(web3, end_block)
+                results.put((end_block, chunk_rewards, date_time_str))
 
-        # Append to CSV
-        append_data_to_csv(csv_file, end_block, date_time_str, cumulative_rewards)
+                start_block = end_block + 1
+                time.sleep(0.2)  # optional sleep to avoid spamming the RPC
+            results.put(None)
+        except Exception as e:
+            results.put(e)
+
+    producer = threading.Thread(target=produce, args=(current_block,), daemon=True)
+    producer.start()
 
-        current_block = end_block + 1
-        time.sleep(0.2)  # optional sleep to avoid spamming the RPC
+    # Resume state is saved every STATE_SAVE_EVERY rows and on the way out, not per row
+    unsaved = 0
+    try:
+        while True:
+            item = results.get()
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                raise item
+            end_block, chunk_rewards, date_time_str = item
+
+            # Update cumulative
+            cumulative_rewards += chunk_rewards / 10**18  # Assuming rewards have 18 decimals
+
+            # Append to CSV
+            append_data_to_csv(csv_file, end_block, date_time_str, cumulative_rewards)
+            unsaved += 1
+            if unsaved >= STATE_SAVE_EVERY:
+                save_resume_state(csv_file, end_block, cumulative_rewards)
+                unsaved = 0
+    finally:
+        if unsaved:
+            save_resume_state(csv_file, end_block, cumulative_rewards)
+
+    producer.join()
 
     print(f"Finished processing {network_name.upper()} ({version_label}).")
 
@@ -366,23 +521,6 @@ def load_historical_prices(csv_path):
         raise ValueError(f"Invalid date format in {csv_path}")
     return df
 
-def find_closest_price(block_date, historical_prices_df):
-    """
-    Finds the closest date in `historical_prices_df` to `block_date` and
-    returns the corresponding price (float).
-    """
-    # Ensure block_date is a datetime.date object
-    if isinstance(block_date, datetime):
-        block_date = block_date.date()
-
-    # Convert to Timestamp for comparison
-    block_date_only = pd.Timestamp(block_date)
-
-    # Calculate absolute difference and find the closest date
-    diffs = (historical_prices_df["date"] - block_date_only).abs()
-    idx = diffs.idxmin()
-    return float(historical_prices_df.loc[idx, "price"])
-
 def calculate_new_usd_rows(new_rows_df, historical_prices_df, starting_token_reward, starting_cumulative_usd):
     """
     Given the new rows (with block, date_time, reward), calculates only
@@ -391,14 +529,18 @@ def calculate_new_usd_rows(new_rows_df, historical_prices_df, starting_token_rew
     cumulative_usd = starting_cumulative_usd
     previous_reward = starting_token_reward
     usd_list = []
+    price_by_day = {}  # many rows share a calendar day, so look each day up once
+    date_ns, prices = price_lookup_arrays(historical_prices_df)
 
-    for _, row in new_rows_df.iterrows():
+    for row in new_rows_df.itertuples(index=False):
         # Convert date_time to just date
-        reward_date = row["date_time"].date()
-        current_reward = row["reward"]
+        reward_date = row.date_time.date()
+        current_reward = row.reward
 
         # Find price
-        price = find_closest_price(row["date_time"], historical_prices_df)
+        price = price_by_day.get(reward_date)
+        if price is None:
+            price = price_by_day[reward_date] = find_closest_price(reward_date, date_ns, prices, day_level=True)
 
         # Incremental difference from the previous row
         incremental_reward = current_reward - previous_reward
@@ -601,9 +743,11 @@ def main():
         )
 
     # 3) Compute or update USD rewards for new data points only
+    #    Networks are independent, so each one is post-processed in its own process.
     print("\n=== CALCULATING/UPDATING CUMULATIVE USD REWARDS ===")
-    for network_name in CONFIG.keys():
-        process_rewards_for_network(network_name)
+    max_workers = min(len(CONFIG), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        list(pool.map(process_rewards_for_network, CONFIG.keys()))
 
     # 4) Generate Cumulative Lending Incentives
     print("\n=== GENERATING CUMULATIVE LENDING INCENTIVES ===")
@@ -1,53 +1,25 @@
 import os
 import csv
-import json
-import time
+import argparse
 import requests
+import numpy as np
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from web3 import Web3
-# Ensure you have an 'abis.py' with necessary ABI definitions or include the ABI directly
-# import abis  # Uncomment if using abis.py
+from helper import fetch_logs_in_windows, fetch_block_timestamps, export_usd_csv, LOG_WINDOW_BATCH
 
 ###############################################################################
-# HELPER FUNCTIONS / ABIs
+# HELPER FUNCTIONS / CONSTANTS
 ###############################################################################
 
-# Define the ABI for the LQTY Issuance Contract
-# Ensure that the ABI includes the TotalLQTYIssuedUpdated event
-LQTY_ISSUANCE_ABI = json.loads("""
-[
-    {
-        "anonymous": false,
-        "inputs": [
-            {
-                "indexed": false,
-                "internalType": "uint256",
-                "name": "latestTotalRewardsIssued",
-                "type": "uint256"
-            }
-        ],
-        "name": "TotalLQTYIssuedUpdated",
-        "type": "event"
-    },
-    {
-        "inputs": [],
-        "name": "issueLQTY",
-        "outputs": [
-            {
-                "internalType": "uint256",
-                "name": "",
-                "type": "uint256"
-            }
-        ],
-        "stateMutability": "nonpayable",
-        "type": "function"
-    }
-]
-""")
-
 WEI = 10**18
 
+# Topic hash of TotalLQTYIssuedUpdated(uint256), computed once at import.
+# The event carries a single non-indexed uint256, so logs are decoded straight
+# from their raw `data` field without an ABI/contract object.
+ISSUANCE_TOPIC = Web3.keccak(text="TotalLQTYIssuedUpdated(uint256)").hex()
+
 ###############################################################################
 # 1) FETCH OR GENERATE HISTORICAL PRICES
 ###############################################################################
@@ -87,6 +59,15 @@ def generate_fixed_prices(from_date, to_date, fixed_price=1.0):
         day_count -= 1
     return result
 
+def coingecko_prices_to_df(raw_data):
+    """
+    Converts CoinGecko [timestamp_ms, price] pairs to a DataFrame with the date
+    truncated to the UTC day, vectorized instead of a strftime per row.
+    """
+    df = pd.DataFrame(raw_data, columns=["ts_ms", "price"])
+    df["date"] = pd.to_datetime(df["ts_ms"], unit="ms").dt.normalize()
+    return df[["date", "price"]]
+
 def maybe_generate_or_update_historical_prices_csv(coin_id, currency, csv_path):
     """
     Checks if the historical prices CSV exists. If it does, updates it with the latest data.
@@ -115,28 +96,21 @@ def maybe_generate_or_update_historical_prices_csv(coin_id, currency, csv_path):
             end_date
         )
 
-        new_rows = []
-        for (ts_ms, price) in raw_data:
-            date_str = datetime.utcfromtimestamp(ts_ms / 1000).strftime('%Y-%m-%d')
-            new_rows.append([date_str, price])
-        df_new = pd.DataFrame(new_rows, columns=["date", "price"])
-        df_new["date"] = pd.to_datetime(df_new["date"])
+        df_new = coingecko_prices_to_df(raw_data)
 
-        updated = pd.concat([df, df_new], ignore_index=True)
+        # Single concat of existing + new frames, then dedupe and sort only if needed
+        frames = [df, df_new]
+        updated = pd.concat(frames, ignore_index=True)
         updated.drop_duplicates(subset=["date"], keep="last", inplace=True)
-        updated.sort_values("date", inplace=True)
+        if not updated["date"].is_monotonic_increasing:
+            updated.sort_values("date", inplace=True)
 
         updated.to_csv(csv_path, index=False)
         print(f"Successfully updated {csv_path} with new data.")
     else:
         print(f"[INFO] {csv_path} does not exist — creating now...")
         raw_data = coingecko_fetch_prices(coin_id, currency, start_date, end_date)
-        new_rows = []
-        for (ts_ms, price) in raw_data:
-            date_str = datetime.utcfromtimestamp(ts_ms / 1000).strftime('%Y-%m-%d')
-            new_rows.append([date_str, price])
-        df = pd.DataFrame(new_rows, columns=["date", "price"])
-        df["date"] = pd.to_datetime(df["date"])
+        df = coingecko_prices_to_df(raw_data)
         df.to_csv(csv_path, index=False)
         print(f"Successfully created {csv_path} with historical price data.")
 
@@ -155,19 +129,10 @@ def load_historical_prices(csv_path):
     df["date"] = pd.to_datetime(df["date"], format="%Y-%m-%d", errors="coerce")
     if df["date"].isna().any():
         raise ValueError(f"Invalid date format in {csv_path}")
-    return df
-
-def find_closest_price(block_date, historical_prices_df):
-    """
-    Finds the closest date in `historical_prices_df` to `block_date` and
-    returns the corresponding price (float).
-    """
-    block_date_only = block_date.normalize() if hasattr(block_date, 'normalize') else block_date
-    block_date_only = block_date_only.replace(hour=0, minute=0, second=0, microsecond=0)
 
-    diffs = (historical_prices_df["date"] - block_date_only).abs()
-    idx = diffs.idxmin()
-    return float(historical_prices_df.loc[idx, "price"])
+    # Keep dates sorted so calculate_new_usd_rows can merge_asof without re-sorting
+    df.sort_values("date", inplace=True, ignore_index=True)
+    return df
 
 ###############################################################################
 # 2) CONFIGURATION
@@ -209,13 +174,6 @@ def setup_web3(rpc_url):
         raise ConnectionError(f"Could not connect to {rpc_url}")
     return w3
 
-def get_block_datetime(w3, block_num):
-    """
-    Fetch block timestamp and return a datetime object (UTC).
-    """
-    block_data = w3.eth.get_block(block_num)
-    return datetime.utcfromtimestamp(block_data.timestamp)
-
 ###############################################################################
 # 4) PHASE 1: Collect Raw LQTY Issuance Data
 ###############################################################################
@@ -230,77 +188,70 @@ def usd_csv_path(network):
 
 def load_existing_raw_csv(network):
     """
-    Returns existing data from the raw CSV, or empty lists if none.
+    Returns existing data from the raw CSV, or empty arrays if none.
     Format: [block, date_time, cumulative_lqty]
+    Parsed with pandas' C engine and returned as NumPy arrays.
     """
     path = raw_csv_path(network)
-    if not os.path.exists(path):
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
         return [], [], []
 
-    blocks, dates, cumulatives = [], [], []
-    with open(path, "r", newline="") as f:
-        reader = csv.reader(f)
-        for row in reader:
-            if len(row) < 3:
-                continue
-            blocks.append(int(row[0]))
-            dates.append(row[1])
-            cumulatives.append(float(row[2]))
-    return blocks, dates, cumulatives
+    df = pd.read_csv(
+        path,
+        header=None,
+        names=["block", "date_time", "cumulative_lqty"],
+        dtype={"block": "int64", "date_time": "str", "cumulative_lqty": "float64"},
+        float_precision="round_trip",  # resume totals must match the file exactly
+        engine="c"
+    )
+    return df["block"].to_numpy(), df["date_time"].to_numpy(), df["cumulative_lqty"].to_numpy()
 
-def append_raw_csv(network, block_num, date_str, cumulative_lqty):
+def append_raw_csv(network, rows):
     """
-    Append a single row [block, date_time, cumulative_lqty].
+    Append rows of [block, date_time, cumulative_lqty] with a single open/write.
     """
     path = raw_csv_path(network)
     os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "a", newline="") as f:
+    with open(path, "a", newline="", buffering=1 << 20) as f:
         writer = csv.writer(f)
-        writer.writerow([block_num, date_str, cumulative_lqty])
+        writer.writerows(rows)
 
-def fetch_issuance_logs(lqty_contract, from_block, to_block, retries=5, delay=2):
+def fetch_issuance_logs(rpc_url, lqty_issuance_addr, windows, retries=5, delay=2):
     """
-    Retrieve logs for the TotalLQTYIssuedUpdated event in the given block range using get_logs.
+    Retrieve raw TotalLQTYIssuedUpdated logs for every (from_block, to_block) window,
+    dispatching the eth_getLogs calls concurrently. Returns a dict keyed by to_block.
     Includes retry logic for transient errors.
     """
-    event_signature_text = "TotalLQTYIssuedUpdated(uint256)"
-    event_signature_hash = Web3.keccak(text=event_signature_text).hex()
-
-    attempt = 0
-    while attempt < retries:
-        try:
-            logs = lqty_contract.web3.eth.get_logs({
-                'fromBlock': from_block,
-                'toBlock': to_block,
-                'address': lqty_contract.address,
-                'topics': [event_signature_hash]
-            })
-            # Decode logs
-            decoded_logs = [lqty_contract.events.TotalLQTYIssuedUpdated().processLog(log) for log in logs]
-            return decoded_logs
-        except Exception as e:
-            print(f"Attempt {attempt + 1} - Error fetching issuance logs: {e}")
-            time.sleep(delay)
-            attempt += 1
-            delay *= 2  # Exponential backoff
-    print(f"Failed to fetch logs after {retries} attempts.")
-    return []
+    return fetch_logs_in_windows(
+        rpc_url,
+        windows,
+        Web3.toChecksumAddress(lqty_issuance_addr),
+        [ISSUANCE_TOPIC],
+        retries=retries,
+        delay=delay
+    )
 
 def parse_issuance_logs(logs):
     """
     Extract the 'latestTotalRewardsIssued' from each TotalLQTYIssuedUpdated event log
     and return the highest cumulative LQTY issued in the block range.
-    """
-    max_cumulative = 0.0
-    for log in logs:
-        try:
-            cumulative_wei = log['args']['latestTotalRewardsIssued']
-            cumulative_lqty = cumulative_wei / WEI
-            if cumulative_lqty > max_cumulative:
-                max_cumulative = cumulative_lqty
-        except Exception as e:
-            print(f"Error parsing issuance log: {e}")
-    return max_cumulative
+    Values are compared as exact wei integers; the single float division by WEI
+    happens only on the returned maximum.
+    """
+    try:
+        # The event's only field is the uint256 latestTotalRewardsIssued
+        max_cumulative_wei = max((int(log['data'], 16) for log in logs), default=0)  # int, exact
+    except Exception:
+        # Rare path: redo it per log to report and skip the malformed entries
+        max_cumulative_wei = 0
+        for log in logs:
+            try:
+                cumulative_wei = int(log['data'], 16)
+                if cumulative_wei > max_cumulative_wei:
+                    max_cumulative_wei = cumulative_wei
+            except Exception as e:
+                print(f"Error parsing issuance log: {e}")
+    return max_cumulative_wei / WEI
 
 def process_lqty_issuance_network(network, netconf):
     """
@@ -311,12 +262,6 @@ def process_lqty_issuance_network(network, netconf):
     w3 = setup_web3(netconf["rpc"])
     lqty_issuance_addr = netconf["contracts"]["lqtyIssuance"]
 
-    # Build the contract object
-    lqty_issuance = w3.eth.contract(
-        address=Web3.toChecksumAddress(lqty_issuance_addr),
-        abi=LQTY_ISSUANCE_ABI
-    )
-
     # Load last synced block + last cumulative LQTY
     blocks_list, dates_list, cumulatives_list = load_existing_raw_csv(network)
     if len(blocks_list) == 0:
@@ -326,38 +271,61 @@ def process_lqty_issuance_network(network, netconf):
         last_synced_block = blocks_list[-1] + 1
         cumulative_lqty = cumulatives_list[-1]
 
-    # Current chain tip
-    current_block = w3.eth.block_number
     block_increment = netconf["block_increment"]
 
-    while last_synced_block <= current_block:
-        to_block = min(last_synced_block + block_increment - 1, current_block)
-        print(f"  Processing blocks {last_synced_block} → {to_block} ...")
-
-        # Fetch Issuance logs in this range
-        logs = fetch_issuance_logs(lqty_issuance, last_synced_block, to_block)
-
-        if logs:
-            # Get the maximum cumulative LQTY issued in this block range
-            max_cumulative = parse_issuance_logs(logs)
-            if max_cumulative > cumulative_lqty:
-                cumulative_lqty = max_cumulative
-        else:
-            # No new issuance in this block range
-            pass
-
-        # Mark CSV row by the `to_block`'s timestamp (converted to string)
-        try:
-            block_dt = get_block_datetime(w3, to_block)
-            block_dt_str = block_dt.strftime('%Y-%m-%d %H:%M:%S')
-        except Exception as e:
-            print(f"Error fetching block datetime for block {to_block}: {e}")
-            block_dt_str = "Unknown"
-
-        append_raw_csv(network, to_block, block_dt_str, cumulative_lqty)
-
-        last_synced_block = to_block + 1
-        current_block = w3.eth.block_number  # Update if chain advanced
+    # Snapshot the chain tip once for the backfill, then re-read it a single time
+    # to catch up on blocks produced while the backfill ran
+    for _ in range(2):
+        current_block = w3.eth.block_number
+
+        while last_synced_block <= current_block:
+            # Split the remaining range into block windows and fetch a batch of them concurrently
+            windows = []
+            from_block = last_synced_block
+            while from_block <= current_block and len(windows) < LOG_WINDOW_BATCH:
+                to_block = min(from_block + block_increment - 1, current_block)
+                windows.append((from_block, to_block))
+                from_block = to_block + 1
+
+            print(f"  Fetching {len(windows)} windows, blocks {last_synced_block} → {windows[-1][1]} ...")
+            logs_by_block = fetch_issuance_logs(netconf["rpc"], lqty_issuance_addr, windows)
+
+            # One batched lookup for every window's `to_block` timestamp
+            block_datetimes = fetch_block_timestamps(w3, [to_block for _, to_block in windows])
+
+            # Collect the rows in block order and write them out once per batch
+            rows = []
+            for from_block, to_block in windows:
+                print(f"  Processing blocks {from_block} → {to_block} ...")
+                logs = logs_by_block[to_block]
+                if logs is None:
+                    # Stop before the failed window so the next run retries it instead of writing a gap
+                    print(f"Error fetching issuance logs for blocks {from_block} → {to_block}")
+                    append_raw_csv(network, rows)
+                    return
+
+                if logs:
+                    # Get the maximum cumulative LQTY issued in this block range
+                    max_cumulative = parse_issuance_logs(logs)
+                    if max_cumulative > cumulative_lqty:
+                        cumulative_lqty = max_cumulative
+                else:
+                    # No new issuance in this block range
+                    pass
+
+                # Mark CSV row by the `to_block`'s timestamp (converted to string)
+                block_dt = block_datetimes.get(to_block)
+                if block_dt is not None:
+                    block_dt_str = block_dt.strftime('%Y-%m-%d %H:%M:%S')
+                else:
+                    print(f"Error fetching block datetime for block {to_block}")
+                    block_dt_str = "Unknown"
+
+                rows.append([to_block, block_dt_str, cumulative_lqty])
+
+                last_synced_block = to_block + 1
+
+            append_raw_csv(network, rows)
 
     print(f"Finished collecting raw LQTY issuance data for {network}.")
 
@@ -374,23 +342,42 @@ def load_raw_lqty_issuance_csv(network):
     if not os.path.exists(path):
         raise FileNotFoundError(f"No raw CSV found for {network}: {path}")
 
-    df = pd.read_csv(path, header=None, names=["block", "date_time", "lqty_amount"])
-    df["date_time"] = pd.to_datetime(df["date_time"], format="%Y-%m-%d %H:%M:%S")
-    df["lqty_amount"] = pd.to_numeric(df["lqty_amount"], errors="coerce")
+    # Single typed pass: block/amount dtypes and the date format are applied while parsing
+    df = pd.read_csv(
+        path,
+        header=None,
+        names=["block", "date_time", "lqty_amount"],
+        dtype={"block": "int64", "lqty_amount": "float64"},
+        parse_dates=["date_time"],
+        date_format="%Y-%m-%d %H:%M:%S",
+        engine="c"
+    )
+    if not pd.api.types.is_datetime64_any_dtype(df["date_time"]):
+        raise ValueError("Invalid date_time in raw CSV.")
     if df["lqty_amount"].isna().any():
         raise ValueError("Invalid numeric lqty_amount in raw CSV.")
     return df
 
+def usd_parquet_path(network):
+    """Parquet working copy of the "with USD" data; the CSV is only an export."""
+    return os.path.join(CSV_FOLDER, f"{network}_lqty_issued_with_usd.parquet")
+
 def load_existing_usd_csv(network):
     """
-    Load the existing "with USD" CSV if it exists:
+    Load the existing "with USD" data if it exists, preferring the parquet
+    working copy and falling back to the CSV (e.g. on the first run after a fresh checkout):
     columns: [block, date_time, lqty_amount, usd_issued]
     """
+    parquet_path = usd_parquet_path(network)
     path = usd_csv_path(network)
-    if not os.path.exists(path):
+    if os.path.exists(parquet_path):
+        df = pd.read_parquet(parquet_path)
+        path = parquet_path
+    elif os.path.exists(path):
+        df = pd.read_csv(path, parse_dates=["date_time"])
+    else:
         return None
 
-    df = pd.read_csv(path)
     if "block" not in df.columns or "usd_issued" not in df.columns:
         raise ValueError(f"{path} missing required columns (block, usd_issued).")
     return df
@@ -400,33 +387,43 @@ def calculate_new_usd_rows(new_df, historical_prices_df, starting_lqty, starting
     new_df has columns: [block, date_time, lqty_amount].
     We'll only convert the incremental difference (lqty_amount - prev_amount) to USD
     using the historical price for that date. Accumulate into 'usd_issued'.
-    """
-    cumulative_usd = starting_usd
-    prev_lqty_amount = starting_lqty
-    usd_list = []
-
-    for _, row in new_df.iterrows():
-        dt = row["date_time"]
-        price = find_closest_price(dt, historical_prices_df)  # LQTY → USD price
-        current_lqty = row["lqty_amount"]
-
-        # Incremental difference
-        lqty_increment = current_lqty - prev_lqty_amount
-        if lqty_increment < 0:
-            print(f"Warning: Negative LQTY increment detected at block {row['block']}. Skipping.")
-            lqty_increment = 0
-
-        chunk_usd_value = lqty_increment * price
-
-        cumulative_usd += chunk_usd_value
-        usd_list.append(cumulative_usd)
-
-        prev_lqty_amount = current_lqty
-
-    new_df["usd_issued"] = usd_list
+    Prices for all rows are resolved with a single merge_asof, and the running
+    total is computed with NumPy instead of a per-row loop.
+    """
+    # Nearest daily price for each row's calendar day
+    day_keys = pd.DataFrame({
+        "date": new_df["date_time"].dt.normalize().to_numpy().astype("datetime64[ns]"),
+        "row": np.arange(len(new_df))
+    }).sort_values("date", kind="stable")
+    prices_sorted = historical_prices_df[["date", "price"]].astype({"date": "datetime64[ns]"})
+    if not prices_sorted["date"].is_monotonic_increasing:  # load_historical_prices already sorts
+        prices_sorted = prices_sorted.sort_values("date")
+    merged = pd.merge_asof(day_keys, prices_sorted, on="date", direction="nearest")
+    prices = merged.sort_values("row")["price"].to_numpy(dtype="float64")
+
+    # Incremental difference from the previous row
+    lqty_increments = np.diff(new_df["lqty_amount"].to_numpy(dtype="float64"), prepend=starting_lqty)
+    negative = lqty_increments < 0
+    if negative.any():
+        for block in new_df["block"].to_numpy()[negative]:
+            print(f"Warning: Negative LQTY increment detected at block {block}. Skipping.")
+        lqty_increments[negative] = 0
+
+    chunk_usd_values = lqty_increments * prices
+    new_df["usd_issued"] = np.cumsum(np.concatenate(([starting_usd], chunk_usd_values)))[1:]
     return new_df
 
-def process_lqty_issuance_usd(network, netconf):
+def save_usd_df(network, df, export_csv=True, new_rows_df=None):
+    """
+    Write the "with USD" data to its parquet working copy, and optionally
+    export the CSV that the dashboard reads. When `new_rows_df` only extends the
+    data past the CSV's last block, just those rows are appended to the CSV.
+    """
+    df.to_parquet(usd_parquet_path(network), index=False, compression="zstd")
+    if export_csv:
+        export_usd_csv(usd_csv_path(network), df, new_rows_df)
+
+def process_lqty_issuance_usd(network, netconf, export_csv=True):
     """
     Phase 2: Convert raw LQTY issuance (LQTY) → USD using historical prices.
     Partial update only for new blocks.
@@ -450,13 +447,14 @@ def process_lqty_issuance_usd(network, netconf):
 
     if existing_usd_df is None:
         print(f"No existing USD file for {network}, computing from scratch...")
+        # Full backfill: one merge_asof over every raw row, no per-row price lookups
         result_df = calculate_new_usd_rows(
             new_df=raw_df,
             historical_prices_df=historical_prices_df,
             starting_lqty=0.0,
             starting_usd=0.0
         )
-        result_df.to_csv(usd_path, index=False)
+        save_usd_df(network, result_df, export_csv)
         print(f"Saved new file to {usd_path}.")
     else:
         # Partial update for new blocks only
@@ -475,9 +473,15 @@ def process_lqty_issuance_usd(network, netconf):
         # Compute partial
         new_rows_df = calculate_new_usd_rows(new_df, historical_prices_df, starting_lqty, starting_usd)
 
-        combined = pd.concat([existing_usd_df, new_rows_df], ignore_index=True)
-        combined.sort_values(by="block", inplace=True)
-        combined.to_csv(usd_path, index=False)
+        # New rows are all past last_block, so one concat keeps block order;
+        # only sort when the existing file was out of order to begin with.
+        frames = [existing_usd_df, new_rows_df]
+        combined = pd.concat(frames, ignore_index=True)
+        if combined["block"].is_monotonic_increasing:
+            save_usd_df(network, combined, export_csv, new_rows_df=new_rows_df)
+        else:
+            combined.sort_values(by="block", inplace=True)
+            save_usd_df(network, combined, export_csv)
         print(f"Appended new data to {usd_path}.")
 
 ###############################################################################
@@ -489,18 +493,30 @@ def main():
     1) Phase 1: Collect raw LQTY issuance data for each network.
     2) Phase 2: Convert them to USD in a partial post-processing step.
     """
+    parser = argparse.ArgumentParser(description="Sync LQTY issuance and convert it to USD.")
+    parser.add_argument(
+        "--export-csv",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Also write the *_with_usd.csv files read by the dashboard (default: on)."
+    )
+    args = parser.parse_args()
+
     os.makedirs(CSV_FOLDER, exist_ok=True)
     os.makedirs("csv/historical_prices", exist_ok=True)
 
     # Phase 1
     print("=== PHASE 1: Collect Raw LQTY Issuance Data ===")
-    for network, netconf in CONFIG.items():
-        process_lqty_issuance_network(network, netconf)
+    # Networks use separate RPCs and CSVs, so sync them concurrently
+    with ThreadPoolExecutor(max_workers=len(CONFIG)) as executor:
+        futures = [executor.submit(process_lqty_issuance_network, network, netconf) for network, netconf in CONFIG.items()]
+        for future in futures:
+            future.result()
 
     # Phase 2
     print("\n=== PHASE 2: Convert LQTY Issuance to USD ===")
     for network, netconf in CONFIG.items():
-        process_lqty_issuance_usd(network, netconf)
+        process_lqty_issuance_usd(network, netconf, export_csv=args.export_csv)
 
     print("\nAll done!")
 
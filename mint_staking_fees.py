@@ -1,10 +1,10 @@
 import os
 import csv
-import json
-import time
 import pandas as pd
-from datetime import datetime
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from web3 import Web3
+from helper import fetch_logs_in_windows, fetch_block_timestamps, LOG_WINDOW_BATCH
 
 ###############################################################################
 # STUBS OR IMPORTS FOR HELPER FUNCTIONS / ABIs
@@ -17,6 +17,10 @@ from web3 import Web3
 
 WEI = 10**18
 
+# Filter topics, computed once at import instead of per fetch
+TRANSFER_TOPIC = Web3.keccak(text="Transfer(address,address,uint256)").hex()
+ZERO_TOPIC = "0x" + "0" * 64  # from == zero address
+
 ###############################################################################
 # CONFIGURATION
 ###############################################################################
@@ -68,15 +72,12 @@ def setup_web3(rpc_url):
         raise ConnectionError(f"Could not connect to {rpc_url}")
     return w3
 
-def get_block_datetime(w3, block_num):
+@lru_cache(maxsize=None)
+def address_topic(address):
     """
-    Fetch block timestamp and return 'YYYY-MM-DD HH:MM:SS'.
+    Pad an address to a 32-byte topic for eth_getLogs filters.
     """
-    block_data = w3.eth.get_block(block_num)
-    return datetime.utcfromtimestamp(block_data.timestamp).strftime('%Y-%m-%d %H:%M:%S')
-
-def zero_address():
-    return "0x0000000000000000000000000000000000000000"
+    return '0x' + address[2:].lower().zfill(64)
 
 ###############################################################################
 # PHASE 1: Collect raw mint fees (already in USD, no conversion needed)
@@ -93,71 +94,61 @@ def load_existing_raw_csv(network):
     """
     Returns existing data from the raw CSV, or empty arrays if none.
     Format: [block, date_time, cumulative_mint_fees]
+    Parsed with pandas' C engine and returned as NumPy arrays.
     """
     path = raw_csv_path(network)
-    if not os.path.exists(path):
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
         return [], [], []
 
-    blocks, dates, cumulatives = [], [], []
-    with open(path, "r", newline="") as f:
-        reader = csv.reader(f)
-        for row in reader:
-            if len(row) < 3:
-                continue
-            blocks.append(int(row[0]))
-            dates.append(row[1])
-            cumulatives.append(float(row[2]))
-    return blocks, dates, cumulatives
-
-def append_raw_csv(network, block_num, date_time, cumulative_fees):
+    df = pd.read_csv(
+        path,
+        header=None,
+        names=["block", "date_time", "cumulative_mint_fees"],
+        dtype={"block": "int64", "date_time": "str", "cumulative_mint_fees": "float64"},
+        float_precision="round_trip",  # resume totals must match the file exactly
+        engine="c"
+    )
+    return df["block"].to_numpy(), df["date_time"].to_numpy(), df["cumulative_mint_fees"].to_numpy()
+
+def append_raw_csv(network, rows):
     """
-    Append a single row [block, date_time, cumulative_mint_fees].
+    Append rows of [block, date_time, cumulative_mint_fees] with a single open/write.
     """
     path = raw_csv_path(network)
     os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "a", newline="") as f:
+    with open(path, "a", newline="", buffering=1 << 20) as f:
         writer = csv.writer(f)
-        writer.writerow([block_num, date_time, cumulative_fees])
+        writer.writerows(rows)
 
-def fetch_mint_logs(w3, token_address, from_block, to_block, to_contract):
+def fetch_mint_logs(rpc_url, token_address, windows, to_contract):
     """
-    Fetch 'Transfer' event logs indicating mint from zero address -> to_contract.
-    This is typically how ERC-20 mints are recorded.
+    Fetch 'Transfer' event logs indicating mint from zero address -> to_contract
+    for every (from_block, to_block) window, dispatching the eth_getLogs calls concurrently.
+    This is typically how ERC-20 mints are recorded. Returns a dict keyed by to_block.
     """
-    transfer_event_signature = w3.keccak(text="Transfer(address,address,uint256)").hex()
-
-    # We'll need the addresses to be padded to 32 bytes for the filter topics
-    def pad_address_to_32_bytes(address):
-        return '0x' + address[2:].zfill(64)
+    topics = [
+        TRANSFER_TOPIC,
+        ZERO_TOPIC,                   # from == zero address
+        address_topic(to_contract)    # to == mint/staking/vault contract
+    ]
 
-    filter_params = {
-        "fromBlock": from_block,
-        "toBlock": to_block,
-        "address": token_address,
-        "topics": [
-            transfer_event_signature,
-            pad_address_to_32_bytes(zero_address()),   # from == zero address
-            pad_address_to_32_bytes(to_contract)       # to == mint/staking/vault contract
-        ],
-    }
+    return fetch_logs_in_windows(rpc_url, windows, token_address, topics)
 
+def parse_mint_logs(logs):
+    """
+    Sum the minted Transfer values in wei and convert to tokens once at the end.
+    """
     try:
-        logs = w3.eth.get_logs(filter_params)
-        return logs
-    except Exception as e:
-        print(f"Error fetching mint logs: {e}")
-        return []
-
-def parse_mint_logs(w3, logs):
-    minted_sum = 0.0  # float
-    for log in logs:
-        try:
-            value_int = int(log['data'], 16)
-            # Convert directly to float:
-            minted_sum += float(w3.fromWei(value_int, 'ether'))
-        except Exception as e:
-            print(f"Error parsing mint log: {e}")
-    return minted_sum
+        total_wei = sum(int(log['data'], 16) for log in logs)  # int, exact
+    except Exception:
+        # Rare path: redo it per log to report and skip the malformed entries
+        total_wei = 0
+        for log in logs:
+            try:
+                total_wei += int(log['data'], 16)
+            except Exception as e:
+                print(f"Error parsing mint log: {e}")
+    return total_wei / WEI
 
 
 def process_mint_fees_network(network, netconf):
@@ -180,36 +171,61 @@ def process_mint_fees_network(network, netconf):
         last_synced_block = blocks_list[-1] + 1
         cumulative_fees = cumulatives_list[-1]
 
-    # Current chain tip
-    try:
-        current_block = w3.eth.block_number  # Web3 v6
-    except AttributeError:
-        current_block = w3.eth.blockNumber   # Web3 v5
-
     block_increment = netconf["block_increment"]
 
-    while last_synced_block < current_block:
-        to_block = min(last_synced_block + block_increment, current_block)
-        print(f"  Processing blocks {last_synced_block} → {to_block} ...")
-
-        # Fetch mint logs in this range
-        logs = fetch_mint_logs(w3, token_address, last_synced_block, to_block, mint_contract)
-
-        # Sum minted fees in that chunk
-        chunk_minted = parse_mint_logs(w3, logs)
-
-        # Update our cumulative
-        cumulative_fees += chunk_minted
-
-        # Use the `to_block`'s timestamp
-        block_date_time = get_block_datetime(w3, to_block)
-        append_raw_csv(network, to_block, block_date_time, cumulative_fees)
-
-        last_synced_block = to_block + 1
+    # Snapshot the chain tip once for the backfill, then re-read it a single time
+    # to catch up on blocks produced while the backfill ran
+    for _ in range(2):
         try:
-            current_block = w3.eth.block_number
+            current_block = w3.eth.block_number  # Web3 v6
         except AttributeError:
-            current_block = w3.eth.blockNumber
+            current_block = w3.eth.blockNumber   # Web3 v5
+
+        while last_synced_block < current_block:
+            # Split the remaining range into block windows and fetch a batch of them concurrently
+            windows = []
+            from_block = last_synced_block
+            while from_block < current_block and len(windows) < LOG_WINDOW_BATCH:
+                to_block = min(from_block + block_increment, current_block)
+                windows.append((from_block, to_block))
+                from_block = to_block + 1
+
+            print(f"  Fetching {len(windows)} windows, blocks {last_synced_block} → {windows[-1][1]} ...")
+            logs_by_block = fetch_mint_logs(netconf["rpc"], token_address, windows, mint_contract)
+
+            # One batched lookup for every window's `to_block` timestamp
+            block_datetimes = fetch_block_timestamps(w3, [to_block for _, to_block in windows])
+
+            # Collect the rows in block order and write them out once per batch
+            rows = []
+            for from_block, to_block in windows:
+                print(f"  Processing blocks {from_block} → {to_block} ...")
+                logs = logs_by_block[to_block]
+                if logs is None:
+                    # Stop before the failed window so the next run retries it instead of writing a gap
+                    print(f"Error fetching mint logs for blocks {from_block} → {to_block}")
+                    append_raw_csv(network, rows)
+                    return
+
+                # Sum minted fees in that chunk
+                chunk_minted = parse_mint_logs(logs)
+
+                # Update our cumulative
+                cumulative_fees += chunk_minted
+
+                # Use the `to_block`'s timestamp
+                block_dt = block_datetimes.get(to_block)
+                if block_dt is None:
+                    # Stop here so the next run resumes from this window instead of writing a gap
+                    print(f"Error fetching block datetime for block {to_block}")
+                    append_raw_csv(network, rows)
+                    return
+                block_date_time = block_dt.strftime('%Y-%m-%d %H:%M:%S')
+                rows.append([to_block, block_date_time, cumulative_fees])
+
+                last_synced_block = to_block + 1
+
+            append_raw_csv(network, rows)
 
     print(f"Finished collecting mint fees for {network}.")
 
@@ -226,8 +242,11 @@ def main():
 
     # Phase 1 (and only): Collect Mint Fees
     print("=== PHASE 1: Collect Mint Fees (already in USD) ===")
-    for network, netconf in CONFIG.items():
-        process_mint_fees_network(network, netconf)
+    # Networks use separate RPCs and CSVs, so sync them concurrently
+    with ThreadPoolExecutor(max_workers=len(CONFIG)) as executor:
+        futures = [executor.submit(process_mint_fees_network, network, netconf) for network, netconf in CONFIG.items()]
+        for future in futures:
+            future.result()
 
     print("\nAll done!")
 
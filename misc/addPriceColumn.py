@@ -1,7 +1,15 @@
 import os
+import numpy as np
 import pandas as pd
 from datetime import datetime
 
+# pyarrow parses and type-converts CSVs in native code; fall back to the C parser without it
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = "pyarrow"
+except ImportError:
+    CSV_ENGINE = "c"
+
 def load_csv_files(historical_prices_file, rewards_file):
     """
     Loads the historical prices and rewards CSV files into DataFrames.
@@ -9,14 +17,14 @@ def load_csv_files(historical_prices_file, rewards_file):
     """
     # Load historical prices
     try:
-        historical_prices = pd.read_csv(historical_prices_file)
+        historical_prices = pd.read_csv(historical_prices_file, engine=CSV_ENGINE)
         historical_prices.rename(columns=lambda x: x.strip().lower(), inplace=True)
 
         # Validate columns
         if "date" not in historical_prices.columns or "price" not in historical_prices.columns:
             raise KeyError(f"Columns 'date' and 'price' not found in {historical_prices_file}. Found: {historical_prices.columns}")
 
-        # Parse dates
+        # Parse dates (header names are only normalized after the read)
         historical_prices["date"] = pd.to_datetime(historical_prices["date"], format="%Y-%m-%d", errors="coerce")
         if historical_prices["date"].isna().any():
             raise ValueError(f"Invalid date format in {historical_prices_file}")
@@ -25,12 +33,18 @@ def load_csv_files(historical_prices_file, rewards_file):
     
     # Load rewards
     try:
-        rewards = pd.read_csv(rewards_file, header=None, names=["block", "date_time", "reward"])
-        rewards["date_time"] = pd.to_datetime(rewards["date_time"], format="%Y-%m-%d %H:%M:%S", errors="coerce")
-        if rewards["date_time"].isna().any():
+        rewards = pd.read_csv(
+            rewards_file,
+            header=None,
+            names=["block", "date_time", "reward"],
+            dtype={"block": "int64", "reward": "float64"},
+            parse_dates=["date_time"],
+            date_format="%Y-%m-%d %H:%M:%S",
+            engine=CSV_ENGINE
+        )
+        if not pd.api.types.is_datetime64_any_dtype(rewards["date_time"]) or rewards["date_time"].isna().any():
             raise ValueError(f"Invalid date_time format in {rewards_file}")
         
-        rewards["reward"] = pd.to_numeric(rewards["reward"], errors="coerce")
         if rewards["reward"].isna().any():
             raise ValueError(f"Invalid reward format in {rewards_file}")
     except Exception as e:
@@ -39,46 +53,26 @@ def load_csv_files(historical_prices_file, rewards_file):
     return historical_prices, rewards
 
 
-def find_closest_price(date, historical_prices):
-    """
-    Finds the closest date in the historical prices DataFrame to the given date.
-    """
-    # Convert date to datetime to ensure compatibility
-    date = pd.to_datetime(date)
-
-    # Find the closest date and return its corresponding price
-    closest_date = historical_prices.iloc[(historical_prices["date"] - date).abs().argsort()[:1]]
-    return closest_date.iloc[0]["price"]
-
 def calculate_cumulative_usd_rewards(historical_prices, rewards):
     """
-    Calculates the USD rewards incrementally and ensures cumulative USD rewards never decrease.
+    Calculates the USD rewards incrementally and accumulates them into 'usd_rewards'.
+    Prices are matched to each reward's date with one merge_asof, and the
+    increments and running total are computed with NumPy.
     """
-    cumulative_usd_rewards = 0  # Initialize cumulative USD rewards
-    usd_rewards = []
-    previous_reward = 0  # Keep track of the previous reward amount
+    # Closest price for each reward date (rows keep their original order)
+    day_keys = pd.DataFrame({
+        "date": rewards["date_time"].dt.normalize().to_numpy().astype("datetime64[ns]"),
+        "row": np.arange(len(rewards))
+    }).sort_values("date", kind="stable")
+    prices_sorted = historical_prices[["date", "price"]].astype({"date": "datetime64[ns]"}).sort_values("date")
+    merged = pd.merge_asof(day_keys, prices_sorted, on="date", direction="nearest")
+    prices = merged.sort_values("row")["price"].to_numpy(dtype="float64")
 
-    for _, row in rewards.iterrows():
-        reward_date = row["date_time"].date()  # Get the date part only
-        current_reward = row["reward"]
-        
-        # Find the closest price for the reward date
-        price = find_closest_price(reward_date, historical_prices)
-        
-        # Calculate the incremental reward and its USD value
-        incremental_reward = current_reward - previous_reward
-        incremental_usd_value = (incremental_reward / 10**18) * price  # Adjust for decimals
-        
-        # Update cumulative USD rewards
-        cumulative_usd_rewards += incremental_usd_value
-        
-        # Append the cumulative rewards to the list
-        usd_rewards.append(cumulative_usd_rewards)
-        
-        # Update the previous reward for the next iteration
-        previous_reward = current_reward
-    
-    rewards["usd_rewards"] = usd_rewards
+    # Incremental reward since the previous row, adjusted for 18 decimals
+    incremental_rewards = np.diff(rewards["reward"].to_numpy(dtype="float64"), prepend=0.0)
+    incremental_usd_values = (incremental_rewards / 10**18) * prices
+
+    rewards["usd_rewards"] = np.cumsum(incremental_usd_values)
     return rewards
 
 def process_rewards_for_network(network_name):
@@ -1,20 +1,35 @@
 import os
 import csv
+import argparse
 import json
 import time
 import requests
+import numpy as np
 import pandas as pd
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from web3 import Web3
-import abis
+from helper import fetch_logs_in_windows, fetch_block_timestamps, http_session, export_usd_csv, LOG_WINDOW_BATCH
 
 ###############################################################################
 # HELPER FUNCTIONS / ABIs
 ###############################################################################
 
-TROVE_MANAGER_ABI = abis.troveManager()
 WEI = 10**18
 
+# Redemption(_attemptedLUSDAmount, _actualLUSDAmount, _ETHSent, _ETHFee): all four
+# fields are non-indexed uint256 words in `data`, so _ETHFee is the fourth word.
+REDEMPTION_TOPIC = Web3.keccak(text="Redemption(uint256,uint256,uint256,uint256)").hex()
+ETH_FEE_SLICE = slice(2 + 64 * 3, 2 + 64 * 4)
+
+# pyarrow parses and type-converts CSVs in native code; fall back to the C parser without it
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = "pyarrow"
+except ImportError:
+    CSV_ENGINE = "c"
+
 ###############################################################################
 # 1) FETCH OR GENERATE HISTORICAL PRICES
 ###############################################################################
@@ -39,21 +54,42 @@ def coingecko_fetch_prices(coin_id, currency, from_date, to_date):
         raise KeyError("No 'prices' key in CoinGecko response.")
     return data["prices"]  # list of [timestamp_millis, price]
 
+def coingecko_prices_to_df(raw_data):
+    """
+    Converts CoinGecko [timestamp_ms, price] pairs to a DataFrame with the date
+    truncated to the UTC day, vectorized instead of a strftime per row.
+    """
+    df = pd.DataFrame(raw_data, columns=["ts_ms", "price"])
+    df["date"] = pd.to_datetime(df["ts_ms"], unit="ms").dt.normalize()
+    return df[["date", "price"]]
+
 def generate_fixed_telos_prices(from_date, to_date):
     """
     Creates a list of [timestamp_millis, 1.0], day by day from from_date to to_date.
     Telos or any other chain you want pinned to $1 can be handled here.
     """
-    result = []
-    day_count = (to_date - from_date).days + 1
-    current = from_date
-    while day_count > 0:
-        # Convert date to a "timestamp_millis"
-        ts_ms = int(current.timestamp() * 1000)
-        result.append([ts_ms, 1.0])
-        current += timedelta(days=1)
-        day_count -= 1
-    return result
+    days = pd.date_range(from_date, to_date, freq="D")
+    ts_ms = days.as_unit("ms").asi8  # epoch milliseconds, converted in one vectorized step
+    return [[ts, 1.0] for ts in ts_ms.tolist()]
+
+def _tail_date(csv_path):
+    """
+    Date in the first field of the CSV's last line, read from the file's tail, or None.
+    """
+    with open(csv_path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - 512))
+        lines = f.read().splitlines()
+    try:
+        return datetime.strptime(lines[-1].split(b",", 1)[0].decode().strip(), "%Y-%m-%d").date()
+    except (IndexError, ValueError):
+        return None
+
+def _read_prices_csv(csv_path):
+    df = pd.read_csv(csv_path)
+    df.columns = [c.lower().strip() for c in df.columns]
+    df['date'] = pd.to_datetime(df['date'], errors='coerce')
+    return df
 
 def maybe_generate_or_update_historical_prices_csv(coin_id, currency, csv_path):
     # We'll define a cutoff of up to 1 year in the past
@@ -62,13 +98,11 @@ def maybe_generate_or_update_historical_prices_csv(coin_id, currency, csv_path):
 
     if os.path.exists(csv_path):
         print(f"[INFO] Found existing {csv_path}. Updating with latest price data...")
-        # 1) Load existing CSV
-        df = pd.read_csv(csv_path)
-        df.columns = [c.lower().strip() for c in df.columns]
-        df['date'] = pd.to_datetime(df['date'], errors='coerce')
-        
-        # 2) Find the newest date we already have
-        last_date_in_csv = df['date'].max().date()
+        # 1) Find the newest date we already have from the file's last line
+        #    (the CSV is written sorted); only parse the whole file if that fails
+        last_date_in_csv = _tail_date(csv_path)
+        if last_date_in_csv is None:
+            last_date_in_csv = _read_prices_csv(csv_path)['date'].max().date()
         # We can start fetching from day after that last date
         new_start_date = last_date_in_csv + timedelta(days=1)
         
@@ -82,15 +116,14 @@ def maybe_generate_or_update_historical_prices_csv(coin_id, currency, csv_path):
                                           datetime(new_start_date.year, new_start_date.month, new_start_date.day),
                                           end_date)
         
-        # 4) Convert to [Date, Price] and append to existing DataFrame
-        new_rows = []
-        for (ts_ms, price) in raw_data:
-            date_str = datetime.utcfromtimestamp(ts_ms / 1000).strftime('%Y-%m-%d')
-            new_rows.append([date_str, price])
-        df_new = pd.DataFrame(new_rows, columns=["date", "price"])
-        df_new["date"] = pd.to_datetime(df_new["date"])
+        # 4) Convert to [Date, Price]
+        df_new = coingecko_prices_to_df(raw_data)
+        if df_new.empty:
+            print("No new price rows returned — CSV left unchanged.")
+            return
         
-        # 5) Concatenate, sort, and drop any duplicates
+        # 5) Load the existing CSV, concatenate, sort, and drop any duplicates
+        df = _read_prices_csv(csv_path)
         updated = pd.concat([df, df_new], ignore_index=True)
         updated.drop_duplicates(subset=["date"], keep="last", inplace=True)
         updated.sort_values("date", inplace=True)
@@ -112,7 +145,7 @@ def load_historical_prices(csv_path):
     if not os.path.exists(csv_path):
         raise FileNotFoundError(f"Missing historical prices file: {csv_path}")
 
-    df = pd.read_csv(csv_path)
+    df = pd.read_csv(csv_path, engine=CSV_ENGINE)
     df.columns = [c.strip().lower() for c in df.columns]
     if "date" not in df.columns or "price" not in df.columns:
         raise KeyError(f"Missing 'date' or 'price' columns in {csv_path}")
@@ -122,21 +155,21 @@ def load_historical_prices(csv_path):
         raise ValueError(f"Invalid date format in {csv_path}")
     return df
 
-def find_closest_price(block_date, historical_prices_df):
+@lru_cache(maxsize=8)
+def _cached_prices(csv_path, mtime):
     """
-    Finds the closest date in `historical_prices_df` to `block_date` and
-    returns the corresponding price (float).
+    Parsed prices for `csv_path`, reused until the file's mtime changes.
+    The returned DataFrame is shared between callers; treat it as read-only.
     """
-    # Convert block_date to just a date (ignore HH:MM:SS for daily data).
-    # Or keep it as a datetime if you prefer a more precise approach.
-    block_date_only = block_date.normalize() if hasattr(block_date, 'normalize') else block_date
-    block_date_only = block_date_only.replace(hour=0, minute=0, second=0, microsecond=0)
-
-    # Compute absolute difference to each row's date
-    diffs = (historical_prices_df["date"] - block_date_only).abs()
-    idx = diffs.idxmin()
-    return float(historical_prices_df.loc[idx, "price"])
+    return load_historical_prices(csv_path)
 
+def get_historical_prices(csv_path):
+    """
+    load_historical_prices, memoized per price file and invalidated by its mtime.
+    """
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"Missing historical prices file: {csv_path}")
+    return _cached_prices(csv_path, os.path.getmtime(csv_path))
 
 ###############################################################################
 # 2) CONFIGURATION
@@ -187,25 +220,25 @@ CONFIG = {
 
 CSV_FOLDER = "csv/redemption_fees"
 
+# Buffered raw rows are flushed to disk at least this often, so a crash loses little progress
+RAW_FLUSH_EVERY = 50
+
+# Max eth_getLogs requests (and pooled connections) in flight per public RPC
+RPC_CONCURRENCY = 8
+
 ###############################################################################
 # 3) WEB3 SETUP & UTILS
 ###############################################################################
 
 def setup_web3(rpc_url):
-    w3 = Web3(Web3.HTTPProvider(rpc_url))
+    # Share this thread's pooled keep-alive session with the timestamp batches
+    w3 = Web3(Web3.HTTPProvider(rpc_url, session=http_session(RPC_CONCURRENCY)))
     if rpc_url == "https://rpc.mainnet.taraxa.io":
         return w3
     if not w3.isConnected():
         raise ConnectionError(f"Could not connect to {rpc_url}")
     return w3
 
-def get_block_datetime(w3, block_num):
-    """
-    Fetch block timestamp and return a datetime object (UTC).
-    """
-    block_data = w3.eth.get_block(block_num)
-    return datetime.utcfromtimestamp(block_data.timestamp)
-
 ###############################################################################
 # 4) PHASE 1: Collect raw redemption fees (no USD)
 ###############################################################################
@@ -218,63 +251,70 @@ def usd_csv_path(network):
     """Path for the redemption CSV with USD: [block, date_time, eth_amount, usd_redemptions]."""
     return os.path.join(CSV_FOLDER, f"{network}_redemptions_with_usd.csv")
 
+def usd_parquet_path(network):
+    """Parquet working copy of the "with USD" data; the CSV is only an export."""
+    return os.path.join(CSV_FOLDER, f"{network}_redemptions_with_usd.parquet")
+
 def load_existing_raw_csv(network):
     """
-    Returns existing data from the raw CSV, or empty lists if none.
-    Format: [block, date_time, cumulative_redemptions_eth]
+    Returns the last row of the raw CSV as (block, date_time, cumulative_redemptions_eth),
+    or None if there is no data yet. Parsed in one pass by pandas' C engine.
     """
     path = raw_csv_path(network)
-    if not os.path.exists(path):
-        return [], [], []
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
 
-    blocks, dates, cumulatives = [], [], []
-    with open(path, "r", newline="") as f:
-        reader = csv.reader(f)
-        for row in reader:
-            if len(row) < 3:
-                continue
-            blocks.append(int(row[0]))
-            dates.append(row[1])
-            cumulatives.append(float(row[2]))
-    return blocks, dates, cumulatives
+    df = pd.read_csv(
+        path,
+        header=None,
+        names=["block", "date_time", "cumulative"],
+        dtype={"block": "int64", "date_time": "str", "cumulative": "float64"},
+        float_precision="round_trip",  # resume totals must match the file exactly
+        engine="c"
+    )
+    if df.empty:
+        return None
+    return int(df["block"].iat[-1]), df["date_time"].iat[-1], float(df["cumulative"].iat[-1])
 
-def append_raw_csv(network, block_num, date_str, cumulative_eth):
+def append_raw_csv(network, rows):
     """
-    Append a single row [block, date_time, cumulative_redemptions_eth].
+    Append rows of [block, date_time, cumulative_redemptions_eth] with a single open/write.
     """
+    if not rows:
+        return
     path = raw_csv_path(network)
     os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "a", newline="") as f:
+    with open(path, "a", newline="", buffering=1 << 20) as f:
         writer = csv.writer(f)
-        writer.writerow([block_num, date_str, cumulative_eth])
+        writer.writerows(rows)
 
-def fetch_redemption_logs(trove_manager_contract, from_block, to_block):
+def fetch_redemption_logs(rpc_url, trove_manager_addr, windows):
     """
-    Retrieve logs for the Redemption event in the given block range.
+    Retrieve raw Redemption event logs for every (from_block, to_block) window,
+    with up to RPC_CONCURRENCY eth_getLogs calls in flight. Each window's to_block timestamp
+    is requested in the same JSON-RPC batch. Returns a dict keyed by to_block.
     """
-    try:
-        logs = trove_manager_contract.events.Redemption().getLogs(
-            fromBlock=from_block,
-            toBlock=to_block
-        )
-        return logs
-    except Exception as e:
-        print(f"Error fetching redemption logs: {e}")
-        return []
+    return fetch_logs_in_windows(
+        rpc_url,
+        windows,
+        Web3.toChecksumAddress(trove_manager_addr),
+        [REDEMPTION_TOPIC],
+        with_timestamps=True,
+        concurrency=RPC_CONCURRENCY
+    )
 
 def parse_redemption_logs(logs):
     """
     Extract the `_ETHFee` from each Redemption event log,
     convert from WEI to ETH, and return the sum of all fees in that block range.
     """
-    redemption_sum = 0.0
+    redemption_wei = 0  # int, exact
     for log in logs:
         try:
-            wei_amount = log['args']['_ETHFee']
-            redemption_sum += wei_amount / WEI
+            redemption_wei += int(log['data'][ETH_FEE_SLICE], 16)
         except Exception as e:
             print(f"Error parsing redemption log: {e}")
-    return redemption_sum
+    return redemption_wei / WEI
 
 def process_redemptions_network(network, netconf):
     """
@@ -285,45 +325,70 @@ def process_redemptions_network(network, netconf):
     w3 = setup_web3(netconf["rpc"])
     trove_manager_addr = netconf["contracts"]["troveManager"]
 
-    # Build the contract object
-    trove_manager = w3.eth.contract(
-        address=Web3.toChecksumAddress(trove_manager_addr),
-        abi=TROVE_MANAGER_ABI
-    )
-
     # Load last synced block + last cumulative redemption
-    blocks_list, dates_list, cumulatives_list = load_existing_raw_csv(network)
-    if len(blocks_list) == 0:
+    last_row = load_existing_raw_csv(network)
+    if last_row is None:
         last_synced_block = netconf["default_start_block"]
         cumulative_eth = 0.0
     else:
-        last_synced_block = blocks_list[-1] + 1
-        cumulative_eth = cumulatives_list[-1]
+        last_block, _, cumulative_eth = last_row
+        last_synced_block = last_block + 1
 
-    # Current chain tip
-    current_block = w3.eth.block_number
     block_increment = netconf["block_increment"]
 
-    while last_synced_block < current_block:
-        to_block = min(last_synced_block + block_increment, current_block)
-        print(f"  Processing blocks {last_synced_block} → {to_block} ...")
-
-        # Fetch Redemption logs in this range
-        logs = fetch_redemption_logs(trove_manager, last_synced_block, to_block)
-
-        # Sum the ETH fees in this chunk
-        chunk_eth = parse_redemption_logs(logs)
-
-        # Update our cumulative
-        cumulative_eth += chunk_eth
-
-        # Mark CSV row by the `to_block`'s timestamp (converted to string)
-        block_dt = get_block_datetime(w3, to_block)
-        block_dt_str = block_dt.strftime('%Y-%m-%d %H:%M:%S')
-        append_raw_csv(network, to_block, block_dt_str, cumulative_eth)
-
-        last_synced_block = to_block + 1
-        current_block = w3.eth.block_number  # update if chain advanced
+    # Snapshot the chain tip once for the backfill, then re-read it a single time
+    # to catch up on blocks produced while the backfill ran
+    for _ in range(2):
+        current_block = w3.eth.block_number
+
+        while last_synced_block < current_block:
+            # Plan the next batch of block windows up front
+            windows = []
+            from_block = last_synced_block
+            while from_block < current_block and len(windows) < LOG_WINDOW_BATCH:
+                to_block = min(from_block + block_increment, current_block)
+                windows.append((from_block, to_block))
+                from_block = to_block + 1
+
+            # Fetch Redemption logs for every window in the batch concurrently
+            print(f"  Fetching {len(windows)} windows, blocks {last_synced_block} → {windows[-1][1]} ...")
+            logs_by_block = fetch_redemption_logs(netconf["rpc"], trove_manager_addr, windows)
+
+            # Timestamps mostly arrived with the logs; batch-fetch whatever is still missing
+            block_datetimes = fetch_block_timestamps(w3, [to_block for _, to_block in windows])
+
+            pending_rows = []
+            for from_block, to_block in windows:
+                print(f"  Processing blocks {from_block} → {to_block} ...")
+                logs = logs_by_block[to_block]
+                if logs is None:
+                    # Stop before the failed window so the next run retries it instead of writing a gap
+                    print(f"Error fetching redemption logs for blocks {from_block} → {to_block}")
+                    append_raw_csv(network, pending_rows)
+                    return
+
+                # Sum the ETH fees in this chunk
+                chunk_eth = parse_redemption_logs(logs)
+
+                # Update our cumulative
+                cumulative_eth += chunk_eth
+
+                # Mark CSV row by the `to_block`'s timestamp (converted to string)
+                block_dt = block_datetimes.get(to_block)
+                if block_dt is None:
+                    # Stop here so the next run resumes from this window instead of writing a gap
+                    print(f"Error fetching block datetime for block {to_block}")
+                    append_raw_csv(network, pending_rows)
+                    return
+                block_dt_str = block_dt.strftime('%Y-%m-%d %H:%M:%S')
+                pending_rows.append([to_block, block_dt_str, cumulative_eth])
+                if len(pending_rows) >= RAW_FLUSH_EVERY:
+                    append_raw_csv(network, pending_rows)
+                    pending_rows = []
+
+                last_synced_block = to_block + 1
+
+            append_raw_csv(network, pending_rows)
 
     print(f"Finished collecting raw redemption fees for {network}.")
 
@@ -334,62 +399,98 @@ def process_redemptions_network(network, netconf):
 def load_raw_redemptions_csv(network):
     """
     Load the raw redemption fees CSV: [block, date_time, cumulative_redemptions_eth].
-    Return a DataFrame with columns: block, date_time, eth_amount.
+    Return a DataFrame with columns: block, date_time, eth_amount, date_only
+    (the calendar day, as a categorical since many windows share a day).
     """
     path = raw_csv_path(network)
     if not os.path.exists(path):
         raise FileNotFoundError(f"No raw CSV found for {network}: {path}")
 
-    df = pd.read_csv(path, header=None, names=["block", "date_time", "eth_amount"])
-    df["date_time"] = pd.to_datetime(df["date_time"], format="%Y-%m-%d %H:%M:%S")
-    df["eth_amount"] = pd.to_numeric(df["eth_amount"], errors="coerce")
+    # Typed columns and native date parsing in the same pass
+    df = pd.read_csv(
+        path,
+        header=None,
+        names=["block", "date_time", "eth_amount"],
+        dtype={"block": "int64", "eth_amount": "float64"},
+        parse_dates=["date_time"],
+        date_format="%Y-%m-%d %H:%M:%S",
+        engine=CSV_ENGINE
+    )
+    if not pd.api.types.is_datetime64_any_dtype(df["date_time"]):
+        raise ValueError("Invalid date_time in raw CSV.")
     if df["eth_amount"].isna().any():
         raise ValueError("Invalid numeric eth_amount in raw CSV.")
+    df["date_only"] = df["date_time"].dt.normalize().astype("category")
     return df
 
 def load_existing_usd_csv(network):
     """
-    Load the existing "with USD" CSV if it exists:
+    Load the existing "with USD" data if it exists, preferring the parquet
+    working copy and falling back to the CSV (e.g. on the first run after a fresh checkout):
     columns: [block, date_time, eth_amount, usd_redemptions]
     """
+    parquet_path = usd_parquet_path(network)
     path = usd_csv_path(network)
-    if not os.path.exists(path):
+    if os.path.exists(parquet_path):
+        df = pd.read_parquet(parquet_path)
+        path = parquet_path
+    elif os.path.exists(path):
+        df = pd.read_csv(path, engine=CSV_ENGINE, parse_dates=["date_time"])
+    else:
         return None
 
-    df = pd.read_csv(path)
     if "block" not in df.columns or "usd_redemptions" not in df.columns:
         raise ValueError(f"{path} missing required columns (block, usd_redemptions).")
     return df
 
+def accumulate_usd(eth_amounts, prices, starting_eth, starting_usd):
+    """
+    Running USD total for cumulative ETH amounts: each row's increment over the
+    previous row, priced and summed onto starting_usd. Pure NumPy kernel.
+    """
+    eth_increments = np.diff(eth_amounts, prepend=starting_eth)
+    chunk_usd_values = eth_increments * prices
+    return np.cumsum(np.concatenate(([starting_usd], chunk_usd_values)))[1:]
+
 def calculate_new_usd_rows(new_df, historical_prices_df, starting_eth, starting_usd):
     """
     new_df has columns: [block, date_time, eth_amount].
     We'll only convert the incremental difference (eth_amount - prev_amount) to USD
     using the historical price for that date. Accumulate into 'usd_redemptions'.
+    Prices are resolved once per distinct day with merge_asof and spread back
+    to the rows through the categorical day codes; the running total is
+    computed with NumPy instead of a per-row loop.
     """
-    cumulative_usd = starting_usd
-    prev_eth_amount = starting_eth
-    usd_list = []
-
-    for _, row in new_df.iterrows():
-        dt = row["date_time"]
-        price = find_closest_price(dt, historical_prices_df)  # e.g. ETH → USD price
-        current_eth = row["eth_amount"]
-
-        # Incremental difference
-        eth_increment = current_eth - prev_eth_amount
-        chunk_usd_value = eth_increment * price
-
-        cumulative_usd += chunk_usd_value
-        usd_list.append(cumulative_usd)
-
-        prev_eth_amount = current_eth
-
-    new_df["usd_redemptions"] = usd_list
+    if "date_only" in new_df.columns:
+        days = new_df.pop("date_only")
+    else:
+        days = new_df["date_time"].dt.normalize().astype("category")
+
+    # Nearest daily price for each distinct calendar day (categories are sorted)
+    day_keys = pd.DataFrame({"date": days.cat.categories.to_numpy().astype("datetime64[ns]")})
+    prices_sorted = historical_prices_df[["date", "price"]].astype({"date": "datetime64[ns]"})
+    if not prices_sorted["date"].is_monotonic_increasing:
+        prices_sorted = prices_sorted.sort_values("date")
+    day_prices = pd.merge_asof(day_keys, prices_sorted, on="date", direction="nearest")["price"].to_numpy(dtype="float64")
+    prices = day_prices[days.cat.codes.to_numpy()]
+
+    new_df["usd_redemptions"] = accumulate_usd(
+        new_df["eth_amount"].to_numpy(dtype="float64"), prices, starting_eth, starting_usd
+    )
     return new_df
 
 
-def process_redemptions_usd(network, netconf):
+def save_usd_df(network, df, export_csv=True, new_rows_df=None):
+    """
+    Write the "with USD" data to its parquet working copy, and optionally
+    export the CSV that the dashboard reads. When `new_rows_df` only extends the
+    data past the CSV's last block, just those rows are appended to the CSV.
+    """
+    df.to_parquet(usd_parquet_path(network), index=False, compression="zstd")
+    if export_csv:
+        export_usd_csv(usd_csv_path(network), df, new_rows_df)
+
+def process_redemptions_usd(network, netconf, export_csv=True):
     """
     Phase 2: Convert raw redemptions (ETH) → USD using historical prices.
     Partial update only for new blocks.
@@ -405,8 +506,8 @@ def process_redemptions_usd(network, netconf):
     # If no CSV yet, auto-generate from CoinGecko or pinned logic
     maybe_generate_or_update_historical_prices_csv(coin_id, "usd", hist_prices_csv)
 
-    # Now load that CSV into a DataFrame
-    historical_prices_df = load_historical_prices(hist_prices_csv)
+    # Now load that CSV into a DataFrame (parsed once per file version)
+    historical_prices_df = get_historical_prices(hist_prices_csv)
 
     # 3) Check for existing "with USD" file
     usd_path = usd_csv_path(network)
@@ -420,7 +521,7 @@ def process_redemptions_usd(network, netconf):
             starting_eth=0.0,
             starting_usd=0.0
         )
-        result_df.to_csv(usd_path, index=False)
+        save_usd_df(network, result_df, export_csv)
         print(f"Saved new file to {usd_path}.")
     else:
         # Partial update for new blocks only
@@ -439,32 +540,50 @@ def process_redemptions_usd(network, netconf):
         # Compute partial
         new_rows_df = calculate_new_usd_rows(new_df, historical_prices_df, starting_eth, starting_usd)
 
+        # New rows are all past last_block, so one concat keeps block order;
+        # only sort when the existing data was out of order to begin with.
         combined = pd.concat([existing_usd_df, new_rows_df], ignore_index=True)
-        combined.sort_values(by="block", inplace=True)
-        combined.to_csv(usd_path, index=False)
+        if combined["block"].is_monotonic_increasing:
+            save_usd_df(network, combined, export_csv, new_rows_df=new_rows_df)
+        else:
+            combined.sort_values(by="block", inplace=True)
+            save_usd_df(network, combined, export_csv)
         print(f"Appended new data to {usd_path}.")
 
 ###############################################################################
 # MAIN
 ###############################################################################
 
-def main():
+def main(concurrency=len(CONFIG)):
     """
     1) Phase 1: Collect raw redemption fees (in ETH or underlying collateral) for each network.
     2) Phase 2: Convert them to USD in a partial post-processing step.
+    Networks use separate RPCs and CSVs, so each phase runs them on up to `concurrency` threads.
     """
+    parser = argparse.ArgumentParser(description="Sync redemption fees and convert them to USD.")
+    parser.add_argument(
+        "--export-csv",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Also write the *_with_usd.csv files read by the dashboard (default: on)."
+    )
+    args = parser.parse_args()
+
     os.makedirs(CSV_FOLDER, exist_ok=True)
     os.makedirs("csv/historical_prices", exist_ok=True)
 
-    # Phase 1
-    print("=== PHASE 1: Collect Raw Redemption Fees (no USD) ===")
-    for network, netconf in CONFIG.items():
-        process_redemptions_network(network, netconf)
-
-    # Phase 2
-    print("\n=== PHASE 2: Convert Redemption Fees to USD ===")
-    for network, netconf in CONFIG.items():
-        process_redemptions_usd(network, netconf)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        # Phase 1
+        print("=== PHASE 1: Collect Raw Redemption Fees (no USD) ===")
+        futures = [executor.submit(process_redemptions_network, network, netconf) for network, netconf in CONFIG.items()]
+        for future in futures:
+            future.result()
+
+        # Phase 2
+        print("\n=== PHASE 2: Convert Redemption Fees to USD ===")
+        futures = [executor.submit(process_redemptions_usd, network, netconf, args.export_csv) for network, netconf in CONFIG.items()]
+        for future in futures:
+            future.result()
 
     print("\nAll done!")
 